@@ -1,9 +1,10 @@
-from datetime import datetime, timezone
 from owrx.config.core import CoreConfig
 from owrx.config import Config
+import bisect
 import json
 import os.path
 import os
+import time
 
 import logging
 
@@ -12,6 +13,8 @@ logger = logging.getLogger(__name__)
 
 class Bookmark(object):
     SCANNABLE_MODES = ["lsb", "usb", "cw", "am", "sam", "nfm"]
+    # There may be thousands of bookmarks in memory, so no per-instance dict
+    __slots__ = ("name", "frequency", "modulation", "underlying", "description", "srcFile", "scannable")
 
     def __init__(self, j, srcFile: str = None):
         self.name = j["name"]
@@ -49,12 +52,12 @@ class Bookmark(object):
 
     def __dict__(self):
         return {
-            "name": self.getName(),
-            "frequency": self.getFrequency(),
-            "modulation": self.getModulation(),
-            "underlying": self.getUnderlying(),
-            "description": self.getDescription(),
-            "scannable": self.isScannable(),
+            "name": self.name,
+            "frequency": self.frequency,
+            "modulation": self.modulation,
+            "underlying": self.underlying,
+            "description": self.description,
+            "scannable": self.scannable,
         }
 
 
@@ -66,7 +69,7 @@ class BookmarkSubscription(object):
 
     def inRange(self, bookmark: Bookmark):
         low, high = self.range
-        return low <= bookmark.getFrequency() <= high
+        return low <= bookmark.frequency <= high
 
     def call(self, *args, **kwargs):
         self.subscriber(*args, **kwargs)
@@ -77,6 +80,8 @@ class BookmarkSubscription(object):
 
 class Bookmarks(object):
     MAIN_DIR = "/etc/openwebrx/bookmarks.d"
+    # Minimum number of seconds between checks for modified bookmark files
+    CHECK_INTERVAL = 2
     sharedInstance = None
 
     @staticmethod
@@ -86,8 +91,12 @@ class Bookmarks(object):
         return Bookmarks.sharedInstance
 
     def __init__(self):
-        self.file_modified = None
+        self.file_fingerprint = None
+        self.file_checked = 0
         self.bookmarks = []
+        # (bookmarks sorted by frequency, their frequencies), replaced as a whole so that
+        # concurrent range queries always bisect a matching pair
+        self.index = ([], [])
         self.subscriptions = []
         # Find all known bookmark files
         self.fileList = self._getBookmarkFiles()
@@ -100,7 +109,7 @@ class Bookmarks(object):
         # Refresh the list of known bookmark files
         self.fileList = self._getBookmarkFiles()
         # Make sure bookmarks are refreshed the next time they are queried
-        self.file_modified = None
+        self.file_fingerprint = None
 
     def _listJsonFiles(self, path: str):
         try:
@@ -132,20 +141,39 @@ class Bookmarks(object):
         return result
 
     def _refresh(self):
-        modified = self._getFileModifiedTimestamp()
-        if self.file_modified is None or modified > self.file_modified:
+        # Do not stat() bookmark files on every single query
+        now = time.monotonic()
+        if self.file_fingerprint is not None and now - self.file_checked < Bookmarks.CHECK_INTERVAL:
+            return
+        self.file_checked = now
+        fingerprint = self._getFileFingerprint()
+        if self.file_fingerprint is None or fingerprint != self.file_fingerprint:
             logger.debug("reloading bookmarks from disk due to file modification")
-            self.bookmarks = self._loadBookmarks()
-            self.file_modified = modified
+            bookmarks = self._loadBookmarks()
+            self.index = Bookmarks._buildIndex(bookmarks)
+            self.bookmarks = bookmarks
+            self.file_fingerprint = fingerprint
 
-    def _getFileModifiedTimestamp(self):
-        timestamp = 0
+    @staticmethod
+    def _buildIndex(bookmarks):
+        # Sort a copy, the bookmark list itself keeps its order
+        ordered = sorted(bookmarks, key=lambda b: b.frequency)
+        return ordered, [b.frequency for b in ordered]
+
+    def _updateIndex(self):
+        self.index = Bookmarks._buildIndex(self.bookmarks)
+
+    def _getFileFingerprint(self):
+        # Modification time alone misses replaced files and coarse timestamps,
+        # so combine it with size and inode of every file
+        result = []
         for file in self.fileList:
             try:
-                timestamp = max(timestamp, os.path.getmtime(file))
+                st = os.stat(file)
+                result.append((st.st_mtime_ns, st.st_size, st.st_ino))
             except FileNotFoundError:
-                pass
-        return datetime.fromtimestamp(timestamp, timezone.utc)
+                result.append(None)
+        return tuple(result)
 
     def _loadBookmarks(self):
         mainFile = Bookmarks._getMainBookmarkFile()
@@ -155,7 +183,7 @@ class Bookmarks(object):
             # Main file bookmarks will not have srcFile set
             srcFile = file if file != mainFile else None
             try:
-                with open(file, "r") as f:
+                with open(file, "rb") as f:
                     content = f.read()
                 if content:
                     # Replace previous bookmarks at the same frequencies
@@ -181,7 +209,10 @@ class Bookmarks(object):
             return self.bookmarks
         else:
             (lo, hi) = range
-            return [b for b in self.bookmarks if lo <= b.getFrequency() <= hi]
+            (bookmarks, frequencies) = self.index
+            start = bisect.bisect_left(frequencies, lo)
+            end = bisect.bisect_right(frequencies, hi, start)
+            return bookmarks[start:end]
 
     @staticmethod
     def _getMainBookmarkFile():
@@ -192,21 +223,25 @@ class Bookmarks(object):
         # Don't write directly to file to avoid corruption on exceptions
         # Only save main file bookmarks, i.e. ones with no srcFle
         jsonContent = json.dumps(
-            [b.__dict__() for b in self.bookmarks if b.getSrcFile() is None],
+            [b.__dict__() for b in self.bookmarks if b.srcFile is None],
             indent=4
         )
         with open(Bookmarks._getMainBookmarkFile(), "w") as file:
             file.write(jsonContent)
-        self.file_modified = self._getFileModifiedTimestamp()
+        self.file_fingerprint = self._getFileFingerprint()
+        # Bookmark frequencies may have been edited in place
+        self._updateIndex()
 
     def addBookmark(self, bookmark: Bookmark):
         self.bookmarks.append(bookmark)
+        self._updateIndex()
         self.notifySubscriptions(bookmark)
 
     def removeBookmark(self, bookmark: Bookmark):
         if bookmark not in self.bookmarks:
             return
         self.bookmarks.remove(bookmark)
+        self._updateIndex()
         self.notifySubscriptions(bookmark)
 
     def notifySubscriptions(self, bookmark: Bookmark):
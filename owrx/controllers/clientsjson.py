@@ -8,6 +8,7 @@ class ClientsJsonController(Controller):
     def handle_request(self):
         clients = []
         registry = ClientRegistry.getSharedInstance()
+        chat = registry.chat
 
         for c in registry.clients:
             entry = {
@@ -15,36 +16,31 @@ class ClientsJsonController(Controller):
                 "connected_since": int(c.conn.startTime.timestamp() * 1000),
             }
 
-            if c.sdr is not None:
-                entry["sdr"] = c.sdr.getName()
-                entry["profile"] = c.sdr.getProfileName()
+            sdr = c.sdr
+            if sdr is not None:
+                entry["sdr"] = sdr.getName()
+                entry["profile"] = sdr.getProfileName()
 
-                # Get frequency from SDR props using [] access
-                try:
-                    props = c.sdr.getProps()
+                # Get frequency from SDR props, fetched once per client
+                props = sdr.getProps()
+                if "center_freq" in props:
                     entry["center_freq"] = props["center_freq"]
-                except:
-                    pass
-                
-                try:
-                    props = c.sdr.getProps()
+                if "samp_rate" in props:
                     entry["samp_rate"] = props["samp_rate"]
-                except:
-                    pass
 
             # Get tuned frequency from DSP if available
-            if hasattr(c, "dsp") and c.dsp:
-                try:
-                    if hasattr(c.dsp, "chain") and c.dsp.chain:
-                        chain = c.dsp.chain
-                        entry["offset_freq"] = getattr(chain, "frequencyOffset", 0)
-                        if hasattr(chain, "props"):
-                            entry["mod"] = chain.props["mod"] if "mod" in chain.props else ""
-                except:
-                    pass
-
-            if c in registry.chat:
-                entry["name"] = registry.chat[c]["name"]
+            try:
+                chain = c.dsp.chain
+            except AttributeError:
+                chain = None
+            if chain:
+                entry["offset_freq"] = getattr(chain, "frequencyOffset", 0)
+                props = getattr(chain, "props", None)
+                if props is not None:
+                    entry["mod"] = props["mod"] if "mod" in props else ""
+
+            if c in chat:
+                entry["name"] = chat[c]["name"]
 
             clients.append(entry)
 
@@ -53,4 +49,4 @@ class ClientsJsonController(Controller):
             "clients": clients
         }
 
-        self.send_response(json.dumps(result), content_type="application/json")
+        self.send_response(json.dumps(result, separators=(",", ":")), content_type="application/json")
@@ -2,6 +2,7 @@
 DX Cluster Client for OpenWebRX+
 """
 
+from collections import deque
 import socket
 import threading
 import re
@@ -13,6 +14,17 @@ logger = logging.getLogger(__name__)
 class DXClusterClient:
     _instance = None
 
+    # Prompts sent by common cluster software when asking for a callsign, matched case-insensitively
+    # ("login:", "call:", "Enter your callsign:", ...)
+    LOGIN_PROMPTS = (b'login', b'call')
+    # Prompts sent when the cluster is ready to accept the next command
+    COMMAND_PROMPTS = (b'>',)
+
+    # Compiled once and matched against raw socket bytes, so \s and \d stay ASCII-only
+    spot_pattern = re.compile(
+        rb'^DX de ([A-Z0-9/-]+):\s+(\d+\.?\d*)\s+([A-Z0-9/]+)\s*(.*?)\s*(\d{4})Z'
+    )
+
     @classmethod
     def getSharedInstance(cls):
         if cls._instance is None:
@@ -30,38 +42,68 @@ class DXClusterClient:
         self.thread = None
         self.running = False
         self.connected = False
-        self.spots = []
         self.max_spots = 100
+        self.spots = deque(maxlen=self.max_spots)
+        # Immutable copy of the spots handed out by get_spots(), rebuilt on change
+        self._spots_snapshot = None
+        self._spots_lock = threading.Lock()
 
         # Connection params (saved for reconnect)
         self._host = None
         self._port = None
         self._callsign = None
         self._login_script = None
+        self._login_commands = []  # (command, encoded line) pairs
 
-        self.spot_pattern = re.compile(
-            r'^DX de ([A-Z0-9/-]+):\s+(\d+\.?\d*)\s+([A-Z0-9/]+)\s*(.*?)\s*(\d{4})Z'
-        )
+    @staticmethod
+    def _parse_frequency(freq):
+        """Convert kHz bytes like b'14025.1' to integer Hz without a float round-trip"""
+        khz, _, frac = freq.partition(b'.')
+        return int(khz) * 1000 + int((frac + b'000')[:3])
 
-    def parse_spot(self, line):
+    def parse_spot(self, line: bytes):
         match = self.spot_pattern.match(line.strip())
         if match:
             spotter, freq, dx_call, comment, time_str = match.groups()
+            # Cluster traffic is 7-bit ASCII, only free-form comments may contain anything else
             return {
-                'spotter': spotter.strip(),
-                'frequency': int(float(freq) * 1000),
-                'dx_call': dx_call.strip(),
-                'comment': comment.strip(),
-                'time': time_str,
+                'spotter': spotter.decode('ascii'),
+                'frequency': self._parse_frequency(freq),
+                'dx_call': dx_call.decode('ascii'),
+                'comment': comment.strip().decode('ascii', errors='replace'),
+                'time': time_str.decode('ascii'),
                 'timestamp': time.time()
             }
         return None
 
+    @staticmethod
+    def _recv_until(sock, needles, timeout, idle=0.5):
+        """
+        Receive until one of the needles shows up, or give up after timeout seconds.
+        Once data has arrived, a pause of idle seconds ends the wait as well, so
+        prompts that are not among the needles do not cost the full timeout.
+        """
+        buf = b""
+        deadline = time.monotonic() + timeout
+        while not any(needle in buf.lower() for needle in needles):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(min(remaining, idle) if buf else remaining)
+            try:
+                data = sock.recv(4096)
+            except socket.timeout:
+                break
+            if not data:
+                raise ConnectionError("Connection closed by server")
+            buf += data
+        return buf
+
     def _broadcast_spot(self, spot):
         try:
             from owrx.client import ClientRegistry
             ClientRegistry.getSharedInstance().broadcastDxSpot(spot)
-            logger.debug(f"Broadcast spot: {spot['dx_call']}")
+            logger.debug("Broadcast spot: %s", spot['dx_call'])
         except Exception as e:
             logger.debug(f"Broadcast error: {e}")
 
@@ -80,9 +122,11 @@ class DXClusterClient:
         """Reader thread with auto-reconnect"""
         reconnect_delay = 5  # Start with 5 seconds
         max_reconnect_delay = 300  # Max 5 minutes
+        # Receive buffer reused by every read, so no bytes object is created per recv()
+        rxview = memoryview(bytearray(65536))
 
         while self.running:
-            buffer = ""
+            buffer = bytearray()
             sock = None
 
             try:
@@ -93,26 +137,16 @@ class DXClusterClient:
                 logger.info(f"Connected to DX cluster {self._host}:{self._port}")
 
                 # Login
-                time.sleep(0.5)
-                sock.recv(1024)
+                self._recv_until(sock, self.LOGIN_PROMPTS, 5)
                 sock.send(f"{self._callsign}\r\n".encode())
-                time.sleep(1)
-                sock.recv(4096)
+                self._recv_until(sock, self.COMMAND_PROMPTS, 5)
                 logger.info(f"Logged in as {self._callsign}")
 
                 # Execute login script if provided
-                if self._login_script:
-                    for cmd in self._login_script.strip().split('\n'):
-                        cmd = cmd.strip()
-                        if cmd:
-                            logger.info(f"Sending command: {cmd}")
-                            sock.send(f"{cmd}\r\n".encode())
-                            time.sleep(0.5)
-                            try:
-                                sock.settimeout(2)
-                                sock.recv(4096)
-                            except socket.timeout:
-                                pass
+                for cmd, line in self._login_commands:
+                    logger.info(f"Sending command: {cmd}")
+                    sock.send(line)
+                    self._recv_until(sock, self.COMMAND_PROMPTS, 2)
 
                 # Mark as connected and broadcast status
                 self.connected = True
@@ -123,23 +157,29 @@ class DXClusterClient:
                 while self.running:
                     try:
                         sock.settimeout(60)
-                        data = sock.recv(4096)
-                        if not data:
+                        n = sock.recv_into(rxview)
+                        if n == 0:
                             logger.warning("Connection closed by server")
                             break
 
-                        buffer += data.decode('utf-8', errors='replace')
+                        buffer.extend(rxview[:n])
+
+                        # Only complete lines are split off, the partial tail stays buffered
+                        nl = buffer.rfind(b'\n')
+                        if nl < 0:
+                            continue
+                        chunk = bytes(buffer[:nl])
+                        del buffer[:nl + 1]
 
-                        while '\n' in buffer:
-                            line, buffer = buffer.split('\n', 1)
+                        for line in chunk.split(b'\n'):
                             line = line.strip()
-                            if line.startswith('DX de '):
+                            if line.startswith(b'DX de '):
                                 spot = self.parse_spot(line)
                                 if spot:
-                                    self.spots.append(spot)
-                                    if len(self.spots) > self.max_spots:
-                                        self.spots = self.spots[-self.max_spots:]
-                                    logger.info(f"DX Spot: {spot['dx_call']} on {spot['frequency']/1000:.1f} kHz (by {spot['spotter']})")
+                                    with self._spots_lock:
+                                        self.spots.append(spot)
+                                        self._spots_snapshot = None
+                                    logger.info("DX Spot: %s on %.1f kHz (by %s)", spot['dx_call'], spot['frequency'] / 1000, spot['spotter'])
                                     self._broadcast_spot(spot)
                     except socket.timeout:
                         continue
@@ -175,9 +215,16 @@ class DXClusterClient:
         self._port = port
         self._callsign = callsign
         self._login_script = login_script
+        # Split and encode the login script once, not on every reconnect
+        self._login_commands = [
+            (cmd, f"{cmd}\r\n".encode())
+            for cmd in (c.strip() for c in (login_script or "").split('\n')) if cmd
+        ]
 
         self.running = True
-        self.spots = []
+        with self._spots_lock:
+            self.spots = deque(maxlen=self.max_spots)
+            self._spots_snapshot = None
         self.thread = threading.Thread(
             target=self._reader_thread,
             daemon=True,
@@ -203,4 +250,7 @@ class DXClusterClient:
         return self.connected
 
     def get_spots(self):
-        return self.spots.copy()
+        with self._spots_lock:
+            if self._spots_snapshot is None:
+                self._spots_snapshot = tuple(self.spots)
+            return self._spots_snapshot
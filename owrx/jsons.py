@@ -1,4 +1,5 @@
 from owrx.property import PropertyManager
+from types import MappingProxyType
 import json
 
 
@@ -6,4 +7,6 @@ class Encoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, PropertyManager):
             return o.__dict__()
+        if isinstance(o, MappingProxyType):
+            return dict(o)
         return super().default(o)
@@ -6,16 +6,34 @@ Handles parsing JSON output from rs41mod/dfm09mod and map display.
 from owrx.toolbox import TextParser
 from owrx.map import Map, LatLngLocation
 from owrx.config import Config
-from datetime import datetime
+from types import MappingProxyType
 import threading
+import time
+import heapq
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-# Radiosonde icon - balloon symbol
-SONDE_SYMBOL = {"x": 2, "y": 0}  # Balloon symbol in APRS icon set
+# Radiosonde icon - balloon symbol, read-only since all locations share it
+SONDE_SYMBOL = MappingProxyType({"x": 2, "y": 0})  # Balloon symbol in APRS icon set
+
+# Sonde data fields and the map display fields they are shown as
+SONDE_FIELDS = (
+    ("id", "callsign"),
+    ("altitude", "altitude"),
+    ("vel_v", "vspeed"),
+    ("vel_h", "speed"),
+    ("heading", "course"),
+    ("temp", "temp"),
+    ("humidity", "humidity"),
+    ("sats", "sats"),
+    ("type", "mode"),
+    ("frame", "frame"),
+    ("freq", "freq"),
+    ("ttl", "ttl"),
+)
 
 
 class RadiosondeLocation(LatLngLocation):
@@ -25,39 +43,24 @@ class RadiosondeLocation(LatLngLocation):
     def __init__(self, data):
         super().__init__(data["lat"], data["lon"])
         self.data = data
+        self._dict = None
 
     def getSymbol(self):
         return SONDE_SYMBOL
 
     def __dict__(self):
-        res = super(RadiosondeLocation, self).__dict__()
-        res["symbol"] = self.getSymbol()
-        # Map sonde data to display fields
-        if "id" in self.data:
-            res["callsign"] = self.data["id"]
-        if "altitude" in self.data:
-            res["altitude"] = self.data["altitude"]
-        if "vel_v" in self.data:
-            res["vspeed"] = self.data["vel_v"]
-        if "vel_h" in self.data:
-            res["speed"] = self.data["vel_h"]
-        if "heading" in self.data:
-            res["course"] = self.data["heading"]
-        if "temp" in self.data:
-            res["temp"] = self.data["temp"]
-        if "humidity" in self.data:
-            res["humidity"] = self.data["humidity"]
-        if "sats" in self.data:
-            res["sats"] = self.data["sats"]
-        if "type" in self.data:
-            res["mode"] = self.data["type"]
-        if "frame" in self.data:
-            res["frame"] = self.data["frame"]
-        if "freq" in self.data:
-            res["freq"] = self.data["freq"]
-        if "ttl" in self.data:
-            res["ttl"] = self.data["ttl"]
-        return res
+        # Sonde data does not change after construction, so build this once
+        if self._dict is None:
+            data = self.data
+            # Same fields as LatLngLocation, composed directly since the TTL
+            # is normally provided by the sonde data and needs no config lookup
+            res = {"type": "latlon", "lat": self.lat, "lon": self.lon, "symbol": self.getSymbol()}
+            if "ttl" not in data:
+                res["ttl"] = self.getTTL().total_seconds() * 1000
+            # Map sonde data to display fields
+            res.update((dst, data[src]) for src, dst in SONDE_FIELDS if src in data)
+            self._dict = res
+        return self._dict
 
 
 class RadiosondeManager:
@@ -78,6 +81,7 @@ class RadiosondeManager:
     def __init__(self):
         self.lock = threading.Lock()
         self.sondes = {}  # sonde_id -> last_data
+        self.expiry = []  # heap of (expiration_time, sonde_id), one entry per tracked sonde
         self.ttl = 600  # 10 minutes TTL for sondes
 
     def update(self, data):
@@ -86,28 +90,40 @@ class RadiosondeManager:
         if not sonde_id:
             return
 
+        data["ttl"] = self.ttl
+        data["timestamp"] = time.time_ns() // 1000000
+
+        # Update internal tracking, the lock only protects our own state
         with self.lock:
-            # Update internal tracking
-            data["ttl"] = self.ttl
-            data["timestamp"] = datetime.now().timestamp() * 1000
+            if sonde_id not in self.sondes:
+                heapq.heappush(self.expiry, (data["timestamp"] + self.ttl * 1000, sonde_id))
             self.sondes[sonde_id] = data
-
-            # Push to map
-            if "lat" in data and "lon" in data:
-                loc = RadiosondeLocation(data)
-                Map.getSharedInstance().updateLocation(
-                    sonde_id, loc, "Radiosonde"
-                )
+            self._expire(data["timestamp"])
+
+        # Push to map
+        if "lat" in data and "lon" in data:
+            loc = RadiosondeLocation(data)
+            Map.getSharedInstance().updateLocation(
+                sonde_id, loc, "Radiosonde"
+            )
+            if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f"Radiosonde {sonde_id}: {data['lat']:.5f}, {data['lon']:.5f}, {data.get('altitude', 0):.0f}m")
 
     def cleanup(self):
         """Remove expired sondes."""
-        now = datetime.now().timestamp() * 1000
         with self.lock:
-            expired = [k for k, v in self.sondes.items()
-                      if now - v.get("timestamp", 0) > self.ttl * 1000]
-            for k in expired:
-                del self.sondes[k]
+            self._expire(time.time_ns() // 1000000)
+
+    def _expire(self, now):
+        # must be called with the lock held
+        while self.expiry and self.expiry[0][0] < now:
+            _, sonde_id = heapq.heappop(self.expiry)
+            expiration = self.sondes[sonde_id]["timestamp"] + self.ttl * 1000
+            if expiration < now:
+                del self.sondes[sonde_id]
+            else:
+                # updated since the entry was pushed, check again once the new ttl has run out
+                heapq.heappush(self.expiry, (expiration, sonde_id))
 
 
 class RadiosondeParser(TextParser):
@@ -121,15 +137,22 @@ class RadiosondeParser(TextParser):
     def parse(self, msg: bytes):
         """Parse JSON message from radiosonde decoder."""
         try:
-            # Skip empty lines
-            line = msg.decode('utf-8', errors='ignore').strip()
-            if not line or not line.startswith('{'):
+            # Skip empty lines, json.loads() takes the raw bytes directly
+            line = msg.strip()
+            if not line.startswith(b'{'):
+                return None
+            # Status messages without a position are not worth parsing
+            if b'"lat"' not in line or b'"lon"' not in line:
                 return None
 
-            data = json.loads(line)
+            try:
+                data = json.loads(line)
+            except UnicodeDecodeError:
+                # garbled bytes from the decoder, parse whatever is left as before
+                data = json.loads(line.decode("utf-8", "ignore"))
 
-            # Validate required fields
-            if "lat" not in data or "lon" not in data:
+            # Validate required fields, decoders report null positions without a fix
+            if data.get("lat") is None or data.get("lon") is None:
                 return None
 
             # Add metadata
@@ -147,7 +170,7 @@ class RadiosondeParser(TextParser):
 
             # Return data for panel display (unless service mode)
             if not self.service:
-                logger.info(f"Radiosonde panel data: mode={data.get('mode')}, id={data.get('id')}")
+                logger.info("Radiosonde panel data: mode=%s, id=%s", data.get('mode'), data.get('id'))
             return None if self.service else data
 
         except json.JSONDecodeError as e:
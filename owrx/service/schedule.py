@@ -1,7 +1,12 @@
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone, timedelta, time as dt_time
 from owrx.source import SdrSourceEventClient, SdrSourceState, SdrClientClass, SdrBusyState
 from owrx.config import Config
+from functools import lru_cache
+from operator import itemgetter
 import threading
+import sched
+import time
+import bisect
 import math
 from abc import ABC, ABCMeta, abstractmethod
 
@@ -11,6 +16,8 @@ logger = logging.getLogger(__name__)
 
 
 class ScheduleEntry(ABC):
+    __slots__ = ("startTime", "endTime", "profile")
+
     def __init__(self, startTime, endTime, profile):
         self.startTime = startTime
         self.endTime = endTime
@@ -36,29 +43,40 @@ class ScheduleEntry(ABC):
 
 
 class TimeScheduleEntry(ScheduleEntry):
+    __slots__ = ("startSeconds", "endSeconds")
+
+    def __init__(self, startTime, endTime, profile):
+        super().__init__(startTime, endTime, profile)
+        # seconds since midnight, so that isCurrent() can compare plain integers
+        self.startSeconds = startTime.hour * 3600 + startTime.minute * 60 + startTime.second
+        self.endSeconds = endTime.hour * 3600 + endTime.minute * 60 + endTime.second
+
     def isCurrent(self, dt):
-        time = dt.time()
-        if self.startTime < self.endTime:
-            return self.startTime <= time < self.endTime
+        seconds = dt.hour * 3600 + dt.minute * 60 + dt.second
+        if self.startSeconds < self.endSeconds:
+            return self.startSeconds <= seconds < self.endSeconds
         else:
-            return self.startTime <= time or time < self.endTime
+            return self.startSeconds <= seconds or seconds < self.endSeconds
 
     def getScheduledEnd(self):
-        now = datetime.utcnow()
-        end = now.combine(date=now.date(), time=self.endTime)
-        while end < now:
+        now = datetime.now(timezone.utc)
+        end = now.combine(date=now.date(), time=self.endTime, tzinfo=timezone.utc)
+        # today's end is less than a day in the past, so one day ahead is always enough
+        if end < now:
             end += timedelta(days=1)
         return end
 
     def getNextActivation(self):
-        now = datetime.utcnow()
-        start = now.combine(date=now.date(), time=self.startTime)
-        while start < now:
+        now = datetime.now(timezone.utc)
+        start = now.combine(date=now.date(), time=self.startTime, tzinfo=timezone.utc)
+        if start < now:
             start += timedelta(days=1)
         return start
 
 
 class DatetimeScheduleEntry(ScheduleEntry):
+    __slots__ = ()
+
     def isCurrent(self, dt):
         return self.startTime <= dt < self.endTime
 
@@ -71,8 +89,10 @@ class DatetimeScheduleEntry(ScheduleEntry):
 
 class RotationScheduleEntry(ScheduleEntry):
     """Schedule entry for rotation scheduler - activates immediately and ends after interval."""
+    __slots__ = ()
+
     def __init__(self, profile, end_time):
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         super().__init__(now, end_time, profile)
 
     def isCurrent(self, dt):
@@ -88,20 +108,24 @@ class RotationScheduleEntry(ScheduleEntry):
 class Schedule(ABC):
     @staticmethod
     def parse(props):
-        if "scheduler" in props:
+        # property stacks have no get(), and "in" followed by [] would search the layers twice
+        try:
             sc = props["scheduler"]
+        except KeyError:
+            sc = None
+        if sc is not None:
             t = sc["type"] if "type" in sc else "static"
-            if t == "static":
-                return StaticSchedule(sc["schedule"])
-            elif t == "daylight":
-                return DaylightSchedule(sc["schedule"])
-            elif t == "rotation":
-                return RotationSchedule(sc["schedule"])
-            else:
+            scheduleClass = SCHEDULE_TYPES.get(t)
+            if scheduleClass is None:
                 logger.warning("Invalid scheduler type: %s", t)
+                return None
+            return scheduleClass(sc["schedule"])
         # downwards compatibility
-        elif "schedule" in props:
-            return StaticSchedule(props["schedule"])
+        try:
+            schedule = props["schedule"]
+        except KeyError:
+            return None
+        return StaticSchedule(schedule)
 
     @abstractmethod
     def getCurrentEntry(self):
@@ -114,112 +138,198 @@ class Schedule(ABC):
 
 class TimerangeSchedule(Schedule, metaclass=ABCMeta):
     @abstractmethod
-    def getEntries(self):
+    def getEntries(self, now=None):
         pass
 
     def getCurrentEntry(self):
-        current = [p for p in self.getEntries() if p.isCurrent(datetime.utcnow())]
-        if current:
-            return current[0]
-        return None
+        now = datetime.now(timezone.utc)
+        # entries may be computed relative to the current time, so they need to see the same clock reading
+        return next((p for p in self.getEntries(now) if p.isCurrent(now)), None)
 
     def getNextEntry(self):
-        s = sorted(self.getEntries(), key=lambda e: e.getNextActivation())
-        if s:
-            return s[0]
-        return None
+        return min(self.getEntries(), key=lambda e: e.getNextActivation(), default=None)
 
 
 class StaticSchedule(TimerangeSchedule):
     def __init__(self, scheduleDict):
         self.entries = []
         for time, profile in scheduleDict.items():
-            if len(time) != 9:
+            # fixed "HHMM-HHMM" format, so there is no need for strptime()
+            if len(time) != 9 or time[4] != "-" or not time[0:4].isdigit() or not time[5:9].isdigit():
                 logger.warning("invalid schedule spec: %s", time)
                 continue
 
-            startTime = datetime.strptime(time[0:4], "%H%M").replace(tzinfo=timezone.utc).time()
-            endTime = datetime.strptime(time[5:9], "%H%M").replace(tzinfo=timezone.utc).time()
+            try:
+                startTime = dt_time(int(time[0:2]), int(time[2:4]))
+                endTime = dt_time(int(time[5:7]), int(time[7:9]))
+            except ValueError:
+                logger.warning("invalid schedule spec: %s", time)
+                continue
             self.entries.append(TimeScheduleEntry(startTime, endTime, profile))
 
-    def getEntries(self):
+        # (start, end, config index, entry) with start and end in seconds since midnight,
+        # sorted by start; entries wrapping around midnight are split in two
+        self.intervals = []
+        for index, e in enumerate(self.entries):
+            if e.startSeconds < e.endSeconds:
+                self.intervals.append((e.startSeconds, e.endSeconds, index, e))
+            else:
+                self.intervals.append((e.startSeconds, 86400, index, e))
+                if e.endSeconds > 0:
+                    self.intervals.append((0, e.endSeconds, index, e))
+        self.intervals.sort(key=lambda i: i[0])
+        self.intervalStarts = [i[0] for i in self.intervals]
+        # highest end of all intervals up to each index, so that lookups can stop early
+        self.intervalMaxEnds = []
+        maxEnd = 0
+        for i in self.intervals:
+            maxEnd = max(maxEnd, i[1])
+            self.intervalMaxEnds.append(maxEnd)
+
+        # entries sorted by their daily activation time
+        self.activations = sorted(self.entries, key=lambda e: e.startSeconds)
+        self.activationStarts = [e.startSeconds for e in self.activations]
+
+    def getEntries(self, now=None):
         return self.entries
 
+    def getCurrentEntry(self):
+        now = datetime.now(timezone.utc)
+        seconds = now.hour * 3600 + now.minute * 60 + now.second
+        # walk back from the last interval started so far, as long as any of them may still be running.
+        # overlapping entries are resolved in config order, so the covering entry listed first wins
+        i = bisect.bisect_right(self.intervalStarts, seconds) - 1
+        current = None
+        while i >= 0 and self.intervalMaxEnds[i] > seconds:
+            start, end, index, entry = self.intervals[i]
+            if seconds < end and (current is None or index < current[0]):
+                current = (index, entry)
+            i -= 1
+        return current[1] if current is not None else None
+
+    def getNextEntry(self):
+        if not self.activations:
+            return None
+        now = datetime.now(timezone.utc)
+        seconds = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1000000
+        # first activation still ahead today, otherwise the first one tomorrow
+        i = bisect.bisect_left(self.activationStarts, seconds)
+        return self.activations[i if i < len(self.activations) else 0]
+
+
+_DEG_TO_RAD = math.pi / 180
+_RAD_TO_DEG = 180 / math.pi
+# sine of the earth's axial tilt
+_SIN_AXIAL_TILT = math.sin(23.45 * _DEG_TO_RAD)
+
+
+@lru_cache(maxsize=32)
+def _computeSunTimes(date, lat, lng):
+    """
+    Returns sunrise and sunset on the given date as hours after midnight (UTC).
+    Results only depend on the arguments, so they are cached; receiver location
+    changes simply result in different cache keys.
+    """
+    # Number of days since 01/01
+    days = date.timetuple().tm_yday
+
+    # Longitudinal correction
+    longCorr = 4 * lng
+
+    # calibrate for solstice
+    b = 2 * math.pi * (days - 81) / 365
+
+    # Equation of Time Correction
+    eoTCorr = 9.87 * math.sin(2 * b) - 7.53 * math.cos(b) - 1.5 * math.sin(b)
+
+    # Solar correction
+    solarCorr = longCorr + eoTCorr
+
+    # Solar declination
+    declination = math.asin(_SIN_AXIAL_TILT * math.sin(b))
+
+    # half the length of the day in hours, sunrise and sunset are symmetric around solar noon
+    halfDay = math.acos(-math.tan(lat * _DEG_TO_RAD) * math.tan(declination)) * _RAD_TO_DEG / 15
+    sunrise = 12 - halfDay - solarCorr / 60
+    sunset = 12 + halfDay - solarCorr / 60
+
+    return sunrise, sunset
+
 
 class DaylightSchedule(TimerangeSchedule):
     greyLineTime = timedelta(hours=1)
 
     def __init__(self, scheduleDict):
         self.schedule = scheduleDict
+        # entries stay valid until the first of them ends, or the receiver moves
+        self.cachedEntries = None
+        self.cacheExpiry = None
+        self.cacheLocation = None
 
-    def getSunTimes(self, date):
+    def getSunTimes(self, dates):
+        """Returns a (sunrise, sunset) pair for each of the given dates"""
         pm = Config.get()
         lat = pm["receiver_gps"]["lat"]
         lng = pm["receiver_gps"]["lon"]
-        degtorad = math.pi / 180
-        radtodeg = 180 / math.pi
-
-        # Number of days since 01/01
-        days = date.timetuple().tm_yday
 
-        # Longitudinal correction
-        longCorr = 4 * lng
+        result = []
+        for date in dates:
+            sunrise, sunset = _computeSunTimes(date, lat, lng)
 
-        # calibrate for solstice
-        b = 2 * math.pi * (days - 81) / 365
+            midnight = datetime.combine(date, datetime.min.time(), tzinfo=timezone.utc)
+            sunrise = midnight + timedelta(hours=sunrise)
+            sunset = midnight + timedelta(hours=sunset)
+            logger.debug("for %s sunrise: %s sunset %s", date, sunrise, sunset)
+            result.append((sunrise, sunset))
 
-        # Equation of Time Correction
-        eoTCorr = 9.87 * math.sin(2 * b) - 7.53 * math.cos(b) - 1.5 * math.sin(b)
+        return result
 
-        # Solar correction
-        solarCorr = longCorr + eoTCorr
+    def getEntries(self, now=None):
+        if now is None:
+            now = datetime.now(timezone.utc)
+        gps = Config.get()["receiver_gps"]
+        location = (gps["lat"], gps["lon"])
+        if self.cachedEntries is not None and location == self.cacheLocation and now < self.cacheExpiry:
+            return self.cachedEntries
 
-        # Solar declination
-        declination = math.asin(math.sin(23.45 * degtorad) * math.sin(b))
-
-        sunrise = 12 - math.acos(-math.tan(lat * degtorad) * math.tan(declination)) * radtodeg / 15 - solarCorr / 60
-        sunset = 12 + math.acos(-math.tan(lat * degtorad) * math.tan(declination)) * radtodeg / 15 - solarCorr / 60
-
-        midnight = datetime.combine(date, datetime.min.time())
-        sunrise = midnight + timedelta(hours=sunrise)
-        sunset = midnight + timedelta(hours=sunset)
-        logger.debug("for {date} sunrise: {sunrise} sunset {sunset}".format(date=date, sunrise=sunrise, sunset=sunset))
-
-        return sunrise, sunset
-
-    def getEntries(self):
-        now = datetime.utcnow()
         date = now.date()
         # greyline is optional, it its set it will shorten the other profiles
         useGreyline = "greyline" in self.schedule
-        entries = []
-
         delta = DaylightSchedule.greyLineTime if useGreyline else timedelta()
-        events = []
-        # we need to start yesterday for longitudes close to the date line
-        offset = -1
-        while len(events) < 1:
-            sunrise, sunset = self.getSunTimes(date + timedelta(days=offset))
-            offset += 1
-            events += [{"type": "sunrise", "time": sunrise}, {"type": "sunset", "time": sunset}]
-            # keep only events in the future
-            events = [v for v in events if v["time"] + delta > now]
-        events.sort(key=lambda e: e["time"])
+        # we need to start yesterday for longitudes close to the date line,
+        # tomorrow's events are always in the future
+        sunTimes = self.getSunTimes([date + timedelta(days=offset) for offset in (-1, 0, 1)])
+        # keep only events in the future
+        # (isSunrise, time) tuples
+        events = [
+            (isSunrise, t)
+            for pair in sunTimes
+            for isSunrise, t in zip((True, False), pair)
+            if t + delta > now
+        ]
+        events.sort(key=itemgetter(1))
 
+        entries = []
         previousEvent = None
-        for event in events:
+        for isSunrise, eventTime in events:
             # night profile _until_ sunrise, day profile _until_ sunset
-            stype = "night" if event["type"] == "sunrise" else "day"
-            if stype in self.schedule and (previousEvent is not None or event["time"] - delta > now):
+            stype = "night" if isSunrise else "day"
+            if stype in self.schedule and (previousEvent is not None or eventTime - delta > now):
                 start = now if previousEvent is None else previousEvent
-                entries.append(DatetimeScheduleEntry(start, event["time"] - delta, self.schedule[stype]))
+                entries.append(DatetimeScheduleEntry(start, eventTime - delta, self.schedule[stype]))
             if useGreyline:
                 entries.append(
-                    DatetimeScheduleEntry(event["time"] - delta, event["time"] + delta, self.schedule["greyline"])
+                    DatetimeScheduleEntry(eventTime - delta, eventTime + delta, self.schedule["greyline"])
                 )
-            previousEvent = event["time"] + delta
+            previousEvent = eventTime + delta
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug([str(e) for e in entries])
 
-        logger.debug([str(e) for e in entries])
+        if entries:
+            self.cachedEntries = entries
+            self.cacheExpiry = min(e.endTime for e in entries)
+            self.cacheLocation = location
         return entries
 
 
@@ -231,28 +341,30 @@ class RotationSchedule(Schedule):
         self.interval = (scheduleDict["interval"] if "interval" in scheduleDict else 5) * 60  # Convert minutes to seconds
         self.current_index = 0
         self.current_end_time = None  # Track when current profile expires
+        # Entries handed out last time, reused while profile and end time stay the same
+        self.current_entry = None
+        self.next_entry = None
         logger.info("RotationSchedule initialized with profiles: %s, interval: %d sec", self.profiles, self.interval)
 
     def getCurrentEntry(self):
         if not self.profiles:
             return None
         
-        now = datetime.utcnow()
-        
-        # Check if we need to advance to next profile (current one expired)
-        if self.current_end_time is not None and now >= self.current_end_time:
-            self.current_index = (self.current_index + 1) % len(self.profiles)
-            self.current_end_time = None  # Will be set below
-            logger.info("RotationSchedule: interval expired, advancing to index %d", self.current_index)
-        
-        # Set end time if not set (first call or after advancing)
-        if self.current_end_time is None:
+        now = datetime.now(timezone.utc)
+
+        # first call, or the current profile has expired: advance and start a new interval
+        if self.current_end_time is None or now >= self.current_end_time:
+            if self.current_end_time is not None:
+                self.current_index = (self.current_index + 1) % len(self.profiles)
             self.current_end_time = now + timedelta(seconds=self.interval)
-            logger.info("RotationSchedule: selected profile %s (index %d), ends at %s", 
-                       self.profiles[self.current_index], self.current_index, self.current_end_time)
-        
+            logger.info("RotationSchedule: selected profile %s (index %d), ends at %s",
+                        self.profiles[self.current_index], self.current_index, self.current_end_time)
+
         profile = self.profiles[self.current_index]
-        return RotationScheduleEntry(profile, self.current_end_time)
+        entry = self.current_entry
+        if entry is None or entry.getProfile() != profile or entry.endTime != self.current_end_time:
+            entry = self.current_entry = RotationScheduleEntry(profile, self.current_end_time)
+        return entry
 
     def getNextEntry(self):
         if not self.profiles:
@@ -260,9 +372,73 @@ class RotationSchedule(Schedule):
         # For rotation, next entry is always available (we rotate continuously)
         # Return an entry for the next profile
         next_index = (self.current_index + 1) % len(self.profiles)
-        next_start = self.current_end_time if self.current_end_time else datetime.utcnow()
+        next_start = self.current_end_time if self.current_end_time else datetime.now(timezone.utc)
         next_end = next_start + timedelta(seconds=self.interval)
-        return RotationScheduleEntry(self.profiles[next_index], next_end)
+        profile = self.profiles[next_index]
+        entry = self.next_entry
+        if entry is None or entry.getProfile() != profile or entry.endTime != next_end:
+            entry = self.next_entry = RotationScheduleEntry(profile, next_end)
+        return entry
+
+
+SCHEDULE_TYPES = {
+    "static": StaticSchedule,
+    "daylight": DaylightSchedule,
+    "rotation": RotationSchedule,
+}
+
+
+class SelectionTimer(object):
+    """
+    Keeps the pending profile selections of all ServiceSchedulers on one shared thread
+    instead of starting a new threading.Timer for every selection. Due selections are
+    handed off to a thread of their own, since starting a source can block for a while.
+    """
+    creationLock = threading.Lock()
+    sharedInstance = None
+
+    @staticmethod
+    def getSharedInstance():
+        with SelectionTimer.creationLock:
+            if SelectionTimer.sharedInstance is None:
+                SelectionTimer.sharedInstance = SelectionTimer()
+            return SelectionTimer.sharedInstance
+
+    def __init__(self):
+        self.wakeup = threading.Event()
+        self.scheduler = sched.scheduler(time.monotonic, self._wait)
+        threading.Thread(target=self._run, name="service_scheduler", daemon=True).start()
+
+    def _wait(self, timeout):
+        self.wakeup.wait(timeout)
+        self.wakeup.clear()
+
+    def _run(self):
+        while True:
+            try:
+                self.scheduler.run()
+            except Exception:
+                logger.exception("Exception while dispatching scheduled profile selection")
+                continue
+            # queue is empty, sleep until something new is entered
+            self._wait(None)
+
+    def _dispatch(self, action):
+        # a slow or failing device must not hold up the selections of all other sources
+        threading.Thread(target=action, name="service_scheduler_selection", daemon=True).start()
+
+    def enter(self, delay, action):
+        event = self.scheduler.enter(delay, 1, self._dispatch, (action,))
+        # the new event may be due before the one the thread is currently waiting for
+        self.wakeup.set()
+        return event
+
+    def cancel(self, event):
+        try:
+            self.scheduler.cancel(event)
+        except ValueError:
+            # event has already run
+            pass
 
 
 class ServiceScheduler(SdrSourceEventClient):
@@ -274,7 +450,7 @@ class ServiceScheduler(SdrSourceEventClient):
         self.schedule = None
         props = self.source.getProps()
         self.subscriptions = []
-        self.subscriptions.append(props.filter("center_freq", "samp_rate").wire(self.onFrequencyChange))
+        self.subscriptions.append(self.source.getFrequencyFilter().wire(self.onFrequencyChange))
         self.subscriptions.append(props.wireProperty("scheduler", self.parseSchedule))
         # wireProperty calls parseSchedule with the initial value
         # self.parseSchedule()
@@ -295,15 +471,15 @@ class ServiceScheduler(SdrSourceEventClient):
             return
         seconds = 10
         if time is not None:
-            delta = time - datetime.utcnow()
+            delta = time - datetime.now(timezone.utc)
             seconds = delta.total_seconds()
         self.cancelTimer()
-        self.selectionTimer = threading.Timer(seconds, self.selectProfile)
-        self.selectionTimer.start()
+        self.selectionTimer = SelectionTimer.getSharedInstance().enter(seconds, self.selectProfile)
 
     def cancelTimer(self):
         if self.selectionTimer:
-            self.selectionTimer.cancel()
+            SelectionTimer.getSharedInstance().cancel(self.selectionTimer)
+            self.selectionTimer = None
 
     def getClientClass(self) -> SdrClientClass:
         if self.currentEntry is None:
@@ -334,12 +510,35 @@ class ServiceScheduler(SdrSourceEventClient):
     def onFrequencyChange(self, changes):
         self.scheduleSelection()
 
+    def _isActive(self, entry):
+        # frequency changes, stops and idle transitions also end up here, so the source needs
+        # to be checked as well before assuming that nothing has changed
+        current = self.currentEntry
+        if current is None or entry.getProfile() != current.getProfile():
+            return False
+        if entry.getScheduledEnd() != current.getScheduledEnd():
+            return False
+        try:
+            return (
+                self.source.getState() is SdrSourceState.RUNNING
+                and self.source.getProfileId() == entry.getProfile()
+            )
+        except KeyError:
+            return False
+
     def _setCurrentEntry(self, entry):
+        if entry is not None and self._isActive(entry):
+            # keep the running profile, only re-arm the timer
+            self.currentEntry = entry
+            self.scheduleSelection(entry.getScheduledEnd())
+            return
+
         self.currentEntry = entry
 
         if entry is not None:
-            logger.debug("selected profile %s until %s", entry.getProfile(), entry.getScheduledEnd())
-            self.scheduleSelection(entry.getScheduledEnd())
+            end = entry.getScheduledEnd()
+            logger.debug("selected profile %s until %s", entry.getProfile(), end)
+            self.scheduleSelection(end)
 
             try:
                 self.source.activateProfile(entry.getProfile())
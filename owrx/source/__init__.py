@@ -159,6 +159,8 @@ class SdrSource(ABC):
         self.profileCarousel.filter("center_freq").wire(self._handleCenterFreqChanged)
 
         self.sdrProps = self.props.filter(*self.getEventNames())
+        # created on demand by getFrequencyFilter()
+        self.frequencyFilter = None
 
         self.wireEvents()
 
@@ -301,6 +303,12 @@ class SdrSource(ABC):
     def getProps(self):
         return self.props
 
+    def getFrequencyFilter(self):
+        # filters stay wired to the props for good, so all consumers share a single one
+        if self.frequencyFilter is None:
+            self.frequencyFilter = self.props.filter("center_freq", "samp_rate")
+        return self.frequencyFilter
+
     def getPort(self):
         return self.port
 
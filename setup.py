@@ -1,6 +1,6 @@
 from glob import glob
 from setuptools import setup
-from owrx.version import looseversion
+from owrx.version import versionstring
 
 try:
     from setuptools import find_namespace_packages
@@ -11,7 +11,7 @@ except ImportError:
 
 setup(
     name="OpenWebRX",
-    version=str(looseversion),
+    version=versionstring,
     packages=find_namespace_packages(
         include=[
             "owrx*",
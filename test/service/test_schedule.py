@@ -0,0 +1,149 @@
+from unittest import TestCase
+from unittest.mock import patch
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from random import Random
+from owrx.service.schedule import StaticSchedule, DaylightSchedule, TimerangeSchedule
+
+
+def mockClock(start, step=timedelta()):
+    """patches datetime.now() in the schedule module, the clock advances by step on every reading"""
+    readings = count()
+
+    class MockDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return start + step * next(readings)
+
+    return patch("owrx.service.schedule.datetime", MockDatetime)
+
+
+class StaticScheduleTest(TestCase):
+    day = datetime(2024, 3, 10, tzinfo=timezone.utc)
+
+    def at(self, hour, minute=0, second=0):
+        return mockClock(self.day.replace(hour=hour, minute=minute, second=second))
+
+    def testSelectsCurrentEntry(self):
+        schedule = StaticSchedule({"0800-1200": "morning", "1400-1800": "afternoon"})
+        with self.at(8):
+            self.assertEqual(schedule.getCurrentEntry().getProfile(), "morning")
+        with self.at(11, 59, 59):
+            self.assertEqual(schedule.getCurrentEntry().getProfile(), "morning")
+        with self.at(12):
+            self.assertIsNone(schedule.getCurrentEntry())
+        with self.at(15):
+            self.assertEqual(schedule.getCurrentEntry().getProfile(), "afternoon")
+
+    def testWrapsAroundMidnight(self):
+        schedule = StaticSchedule({"2200-0200": "night", "1000-1100": "day"})
+        for hour in (22, 23, 0, 1):
+            with self.at(hour, 30):
+                self.assertEqual(schedule.getCurrentEntry().getProfile(), "night")
+        with self.at(2):
+            self.assertIsNone(schedule.getCurrentEntry())
+
+    def testStartEqualsEndCoversWholeDay(self):
+        schedule = StaticSchedule({"0600-0600": "always"})
+        for hour in (0, 5, 6, 12, 23):
+            with self.at(hour, 59, 59):
+                self.assertEqual(schedule.getCurrentEntry().getProfile(), "always")
+
+    def testOverlappingEntries(self):
+        # a long entry started earlier must still be found behind shorter ones
+        schedule = StaticSchedule({"0100-2300": "long", "0200-0300": "short"})
+        with self.at(4):
+            self.assertEqual(schedule.getCurrentEntry().getProfile(), "long")
+
+    def testOverlappingEntriesResolvedInConfigOrder(self):
+        schedule = StaticSchedule({"0000-2359": "default", "1200-1300": "special"})
+        with self.at(12, 30):
+            self.assertEqual(schedule.getCurrentEntry().getProfile(), "default")
+        schedule = StaticSchedule({"1200-1300": "special", "0000-2359": "default"})
+        with self.at(12, 30):
+            self.assertEqual(schedule.getCurrentEntry().getProfile(), "special")
+
+    def testNextEntry(self):
+        schedule = StaticSchedule({"0800-1200": "morning", "2200-0200": "night"})
+        with self.at(12):
+            self.assertEqual(schedule.getNextEntry().getProfile(), "night")
+        with self.at(23):
+            # nothing left today, next one is tomorrow morning
+            self.assertEqual(schedule.getNextEntry().getProfile(), "morning")
+        with self.at(8):
+            self.assertEqual(schedule.getNextEntry().getProfile(), "morning")
+
+    def testEmptySchedule(self):
+        schedule = StaticSchedule({"invalid": "x"})
+        with self.at(12):
+            self.assertIsNone(schedule.getCurrentEntry())
+            self.assertIsNone(schedule.getNextEntry())
+
+    def testMatchesLinearLookup(self):
+        random = Random(42)
+        for _ in range(200):
+            spec = {}
+            for i in range(random.randint(1, 6)):
+                start, end = random.randrange(24 * 60), random.randrange(24 * 60)
+                spec["{:02d}{:02d}-{:02d}{:02d}".format(start // 60, start % 60, end // 60, end % 60)] = str(i)
+            schedule = StaticSchedule(spec)
+            for _ in range(20):
+                now = self.day + timedelta(seconds=random.randrange(24 * 3600))
+                with mockClock(now):
+                    current = schedule.getCurrentEntry()
+                    expected = TimerangeSchedule.getCurrentEntry(schedule)
+                    self.assertIs(current, expected, spec)
+                    self.assertEqual(
+                        schedule.getNextEntry().getNextActivation(),
+                        TimerangeSchedule.getNextEntry(schedule).getNextActivation(),
+                        spec,
+                    )
+
+
+class DaylightScheduleTest(TestCase):
+    def setUp(self):
+        patcher = patch("owrx.service.schedule.Config")
+        self.addCleanup(patcher.stop)
+        config = patcher.start()
+        # Berlin, where days and nights are clearly separated in June
+        config.get.return_value = {"receiver_gps": {"lat": 52.5, "lon": 13.4}}
+
+    def testFirstCallHasCurrentEntry(self):
+        start = datetime(2024, 6, 21, tzinfo=timezone.utc)
+        for minutes in range(0, 24 * 60, 20):
+            with mockClock(start + timedelta(minutes=minutes), timedelta(milliseconds=1)):
+                schedule = DaylightSchedule({"day": "day", "night": "night"})
+                self.assertIsNotNone(schedule.getCurrentEntry(), "no entry at {} minutes".format(minutes))
+
+    def testSelectsDayAndNight(self):
+        with mockClock(datetime(2024, 6, 21, 12, 0, tzinfo=timezone.utc)):
+            self.assertEqual(DaylightSchedule({"day": "day", "night": "night"}).getCurrentEntry().getProfile(), "day")
+        with mockClock(datetime(2024, 6, 21, 0, 0, tzinfo=timezone.utc)):
+            self.assertEqual(DaylightSchedule({"day": "day", "night": "night"}).getCurrentEntry().getProfile(), "night")
+
+    def testNextEntry(self):
+        # only daytime configured: at midnight nothing is current, the day starts at sunrise
+        with mockClock(datetime(2024, 6, 21, 0, 0, tzinfo=timezone.utc)):
+            schedule = DaylightSchedule({"day": "day"})
+            self.assertIsNone(schedule.getCurrentEntry())
+            nextEntry = schedule.getNextEntry()
+        self.assertEqual(nextEntry.getProfile(), "day")
+        self.assertTrue(datetime(2024, 6, 21, 2, 0, tzinfo=timezone.utc) < nextEntry.getNextActivation())
+        self.assertTrue(nextEntry.getNextActivation() < datetime(2024, 6, 21, 4, 0, tzinfo=timezone.utc))
+
+    def testGreylineOnly(self):
+        # the greyline begins an hour before sunset
+        with mockClock(datetime(2024, 6, 21, 12, 0, tzinfo=timezone.utc)):
+            schedule = DaylightSchedule({"greyline": "greyline"})
+            self.assertIsNone(schedule.getCurrentEntry())
+            nextEntry = schedule.getNextEntry()
+        self.assertEqual(nextEntry.getProfile(), "greyline")
+        self.assertTrue(datetime(2024, 6, 21, 18, 0, tzinfo=timezone.utc) < nextEntry.getNextActivation())
+        self.assertTrue(nextEntry.getNextActivation() < datetime(2024, 6, 21, 19, 0, tzinfo=timezone.utc))
+
+    def testCachedEntriesStayCurrent(self):
+        start = datetime(2024, 6, 21, 9, 0, tzinfo=timezone.utc)
+        with mockClock(start, timedelta(minutes=7)):
+            schedule = DaylightSchedule({"day": "day", "night": "night"})
+            for _ in range(400):
+                self.assertIsNotNone(schedule.getCurrentEntry())